@@ -1,43 +1,82 @@
 import random
+from collections import defaultdict, deque
 from operator import attrgetter
 
-def flat_map(f, xs):
-    ys = []
-    for x in xs:
-        ys.extend(f(x))
-    return ys
+import numpy as np
 
+def is_subset(mask1: int, mask2: int):
+    overlap = mask1 & mask2
+    return overlap == mask1 or overlap == mask2
+
+
+def find_diffs(masks: list[int], counts: list[int], cur_mask: int, cur_count: int):
+    # Subtract the current sentence from every sentence that contains it
+    out_masks = []
+    out_counts = []
+    for mask, count in zip(masks, counts):
+        if is_subset(mask, cur_mask):
+            difference = mask & ~cur_mask
+            if difference:
+                out_masks.append(difference)
+                out_counts.append(abs(cur_count - count))
+    return out_masks, out_counts
+
+
+def encode_cell(i: int, j: int, width: int):
+    # Cells are packed as `i * width + j` integers
+    return i * width + j
+
+
+def decode_cell(cell: int, width: int):
+    return divmod(cell, width)
+
+
+def mask_cells(mask: int):
+    # Yield the set bits of the mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def nth_cell(mask: int, n: int):
+    # Return the n-th set bit of the mask, lowest first
+    for _ in range(n):
+        mask &= mask - 1
+    return (mask & -mask).bit_length() - 1
 
-def is_subset(cells1: set[int], cells2: set[int]):
-    return cells1.issubset(cells2) or cells2.issubset(cells1)
 
 class Minesweeper():
     """
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None):
 
-        # Set initial width, height, and number of mines
+        # Set initial width and height
         self.height = height
         self.width = width
-        self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = bytearray(height * width)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        self._rng = random.Random(seed)
+        positions = self._rng.sample(range(height * width), mines)
+        self.mines = {decode_cell(position, width) for position in positions}
+        for position in positions:
+            self.board[position] = 1
+
+        # Precompute the number of nearby mines for every cell
+        H, W = height, width
+        self._board_np = np.zeros((H + 2, W + 2), dtype=np.int8)
+        self._board_np[1:H + 1, 1:W + 1] = np.frombuffer(self.board, dtype=np.int8).reshape(H, W)
+        c = self._board_np
+        self._counts = (
+            c[0:H, 0:W] + c[0:H, 1:W + 1] + c[0:H, 2:W + 2] +
+            c[1:H + 1, 0:W] + c[1:H + 1, 2:W + 2] +
+            c[2:H + 2, 0:W] + c[2:H + 2, 1:W + 1] + c[2:H + 2, 2:W + 2]
+        )
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -50,7 +89,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[encode_cell(i, j, self.width)]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -58,8 +97,7 @@ class Minesweeper():
         print("--" * self.width + "-")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[encode_cell(*cell, self.width)])
 
     def nearby_mines(self, cell):
         """
@@ -68,23 +106,7 @@ class Minesweeper():
         not including the cell itself.
         """
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        return int(self._counts[cell])
 
     def won(self):
         """
@@ -101,47 +123,101 @@ class Sentence():
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        mask = 0
+        for cell in cells:
+            mask |= 1 << cell
+        self.mask = mask
+        self.size = mask.bit_count()
         self.count = count
+        self._key = (mask, count)
+
+    @classmethod
+    def from_mask(cls, mask, count):
+        sentence = cls((), count)
+        sentence.mask = mask
+        sentence.size = mask.bit_count()
+        sentence._key = (mask, count)
+        return sentence
+
+    @property
+    def cells(self):
+        """
+        Returns a copy of the cells in the sentence as a set.
+        Changing the returned set does not change the sentence.
+        """
+        return set(mask_cells(self.mask))
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
     def known_mines(self):
         """
-        Returns the set of all cells in `self.cells` known to be mines.
+        Returns the mask of all cells in the sentence known to be mines.
         """
-        if len(self.cells) == self.count:
-            return self.cells.copy()
-        return set()
+        if self.size == self.count:
+            return self.mask
+        return 0
 
     def known_safes(self):
         """
-        Returns the set of all cells in `self.cells` known to be safe.
+        Returns the mask of all cells in the sentence known to be safe.
         """
         if self.count == 0:
-            return self.cells.copy()
-        return set()
+            return self.mask
+        return 0
 
     def mark_mine(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = 1 << cell
+        if self.mask & bit:
+            self.mask ^= bit
+            self.size -= 1
             self.count -= 1
+            self._key = (self.mask, self.count)
 
     def mark_safe(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = 1 << cell
+        if self.mask & bit:
+            self.mask ^= bit
+            self.size -= 1
+            self._key = (self.mask, self.count)
+
+    def mark_mines(self, mask):
+        """
+        Updates internal knowledge representation given the fact that
+        all cells in `mask` are known to be mines.
+        """
+        overlap = self.mask & mask
+        if overlap:
+            overlap_size = overlap.bit_count()
+            self.mask ^= overlap
+            self.size -= overlap_size
+            self.count -= overlap_size
+            self._key = (self.mask, self.count)
+
+    def mark_safes(self, mask):
+        """
+        Updates internal knowledge representation given the fact that
+        all cells in `mask` are known to be safe.
+        """
+        overlap = self.mask & mask
+        if overlap:
+            self.mask ^= overlap
+            self.size -= overlap.bit_count()
+            self._key = (self.mask, self.count)
 
 
 class MinesweeperAI():
@@ -149,52 +225,114 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, seed=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Random number generator used for random moves
+        self._rng = random.Random(seed)
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
+        self._moves_mask = 0
 
         # Keep track of cells known to be safe or mines
         self.mines = set()
         self.safes = set()
+        self._mines_mask = 0
+        self._safes_mask = 0
+
+        # Keep track of safe cells that have not been clicked on yet
+        self._safe_unused = set()
+
+        # Sentences about the game known to be true, keyed by their id;
+        # callers see them as the `knowledge` view of Sentence objects
+        self._sentences = {}
+
+        # Map each cell to the ids of the sentences mentioning it
+        self._cell_index = defaultdict(set)
+
+        # (mask, count) keys of the sentences in the knowledge base
+        self._knowledge_keys = set()
+
+        # Sentences that may let us conclude new mines or safe cells
+        self._pending = deque()
+        self._pending_ids = set()
+
+        self.board_cells = list(range(self.height * self.width))
+        self._board_mask = (1 << len(self.board_cells)) - 1
+
+        # Precompute the in-bounds neighbors of every cell
+        self._neighbors = [[] for _ in self.board_cells]
+        for x in range(self.height):
+            for y in range(self.width):
+                cell = encode_cell(x, y, self.width)
+                for i in range(max(0, x - 1), min(self.height, x + 2)):
+                    for j in range(max(0, y - 1), min(self.width, y + 2)):
+                        adjoined_cell = encode_cell(i, j, self.width)
+                        if adjoined_cell != cell:
+                            self._neighbors[cell].append(adjoined_cell)
+
+    @property
+    def knowledge(self):
+        """
+        Read-only view of the sentences about the game known to be true.
+        """
+        return self._sentences.values()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
-
-
-        self.board_cells = []
-        for i in range(self.height):
-            for j in range(self.width):
-                self.board_cells.append((i, j))
-
-
+    def _add_sentence(self, sentence: Sentence):
+        if sentence._key in self._knowledge_keys:
+            return
+        self._knowledge_keys.add(sentence._key)
+        self._sentences[id(sentence)] = sentence
+        for cell in mask_cells(sentence.mask):
+            self._cell_index[cell].add(id(sentence))
+        self._queue_if_known(sentence)
+
+    def _remove_sentence(self, sentence: Sentence):
+        # Callers are responsible for the sentence's key
+        del self._sentences[id(sentence)]
+        for cell in mask_cells(sentence.mask):
+            sentence_ids = self._cell_index[cell]
+            sentence_ids.discard(id(sentence))
+            if not sentence_ids:
+                del self._cell_index[cell]
+
+    def _queue_if_known(self, sentence: Sentence):
+        if sentence.count != 0 and sentence.count != sentence.size:
+            return
+        if id(sentence) not in self._pending_ids:
+            self._pending_ids.add(id(sentence))
+            self._pending.append(sentence)
 
     def rebuild_all_knowledge(self):
-        changes_made = False  # Track if any changes are made
-
-        removable = []
-        for knowledge in self.knowledge:
-            mines = knowledge.known_mines()
-            if mines:
-                for mine in mines:
-                    if mine not in self.mines:
-                        self.mines.add(mine)
-                removable.append(knowledge)
+        while self._pending:
+            knowledge = self._pending.popleft()
+            self._pending_ids.discard(id(knowledge))
+            if self._sentences.get(id(knowledge)) is not knowledge:
+                continue  # Already removed from the knowledge base
+            for mine in mask_cells(knowledge.known_mines()):
+                self.mark_mine(mine)
+            for safe in mask_cells(knowledge.known_safes()):
+                self.mark_safe(safe)
+            # Marking may already have dropped it as a duplicate
+            if id(knowledge) in self._sentences:
+                self._knowledge_keys.discard(knowledge._key)
+                self._remove_sentence(knowledge)
+
+    def _update_sentences(self, cell, mark):
+        for sentence_id in self._cell_index.pop(cell, ()):
+            sentence = self._sentences[sentence_id]
+            self._knowledge_keys.discard(sentence._key)
+            mark(sentence)
+            if sentence._key in self._knowledge_keys:
+                # The sentence now duplicates another one
+                self._remove_sentence(sentence)
                 continue
-            safes = knowledge.known_safes()
-            if safes:
-                for safe in safes:
-                    if safe not in self.safes:
-                        self.mark_safe(safe)
-                removable.append(knowledge)
-        for knowledge in removable:
-            self.knowledge.remove(knowledge)
-        if changes_made:
-            self.rebuild_all_knowledge()
+            self._knowledge_keys.add(sentence._key)
+            self._queue_if_known(sentence)
 
     def mark_mine(self, cell):
         """
@@ -204,8 +342,8 @@ class MinesweeperAI():
         if cell in self.mines:
             return
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self._mines_mask |= 1 << cell
+        self._update_sentences(cell, lambda sentence: sentence.mark_mine(cell))
 
     def mark_safe(self, cell):
         """
@@ -215,26 +353,18 @@ class MinesweeperAI():
         if cell in self.safes:
             return
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self._safes_mask |= 1 << cell
+        if cell not in self.moves_made:
+            self._safe_unused.add(cell)
+        self._update_sentences(cell, lambda sentence: sentence.mark_safe(cell))
 
     def normalize_knowledge(self, knowledge: Sentence):
-        for mine in self.mines:
-            knowledge.mark_mine(mine)
-        for safe in self.safes:
-            knowledge.mark_safe(safe)
+        knowledge.mark_mines(self._mines_mask)
+        knowledge.mark_safes(self._safes_mask)
         return knowledge
 
     def create_knowledge(self, cell, count):
-        x, y = cell
-        adjoined_cells = []
-        for i in range(max(0, x - 1), min(self.height, x + 2)):
-            for j in range(max(0, y - 1), min(self.width, y + 2)):
-                adjoined_cell = (i, j)
-                if adjoined_cell == cell:
-                    continue
-                adjoined_cells.append((i, j))
-        knowledge = self.normalize_knowledge(Sentence(adjoined_cells, count))
+        knowledge = self.normalize_knowledge(Sentence(self._neighbors[cell], count))
         return knowledge
 
     def add_knowledge(self, cell, count):
@@ -253,39 +383,44 @@ class MinesweeperAI():
                if they can be inferred from existing knowledge
         """
 
+        cell = encode_cell(*cell, self.width)
         self.moves_made.add(cell)
+        self._moves_mask |= 1 << cell
+        self._safe_unused.discard(cell)
         self.mark_safe(cell)
 
         current_knowledge = self.create_knowledge(cell, count)
 
         if current_knowledge.count:
-            if current_knowledge not in self.knowledge:
+            if current_knowledge._key not in self._knowledge_keys:
                 synthesised_knowledge = self.synthesise_knowledge(current_knowledge)
-                self.knowledge.append(current_knowledge)
+                self._add_sentence(current_knowledge)
 
                 for knowledge in synthesised_knowledge:
-                    if knowledge not in self.knowledge:
-                        self.knowledge.append(knowledge)
+                    self._add_sentence(knowledge)
         else:
-            for cell in current_knowledge.cells:
+            for cell in mask_cells(current_knowledge.mask):
                 self.mark_safe(cell)
 
         self.rebuild_all_knowledge()
 
     def synthesise_knowledge(self, current_knowledge: Sentence):
-        synthesised_knowledge = []
-        current_knowledge_cells = set(current_knowledge.cells)
-        for knowledge in self.knowledge:
-            if knowledge.cells.isdisjoint(current_knowledge.cells):
-                continue  # Skip if there is no overlap in cells
+        candidates = set().union(*(self._cell_index.get(cell, ()) for cell in mask_cells(current_knowledge.mask)))
+        masks = []
+        counts = []
+        for sentence_id in candidates:
+            knowledge = self._sentences[sentence_id]
+            masks.append(knowledge.mask)
+            counts.append(knowledge.count)
 
-            if is_subset(knowledge.cells, current_knowledge.cells):
-                cells_difference = [x for x in knowledge.cells if x not in current_knowledge_cells]
-                if cells_difference:
-                    difference_knowledge = Sentence(cells_difference, abs(current_knowledge.count - knowledge.count))
-                    synthesised_knowledge.append(difference_knowledge)
+        diff_masks, diff_counts = find_diffs(masks, counts, current_knowledge.mask, current_knowledge.count)
+        return [Sentence.from_mask(mask, count) for mask, count in zip(diff_masks, diff_counts)]
 
-        return synthesised_knowledge
+    def known_mines(self):
+        """
+        Returns the set of cells known to be mines, as (i, j) tuples.
+        """
+        return {decode_cell(cell, self.width) for cell in self.mines}
 
     def make_safe_move(self):
         """
@@ -297,10 +432,10 @@ class MinesweeperAI():
         and self.moves_made, but should not modify any of those values.
         """
 
-        for item in self.safes:
-            if item not in self.moves_made:
-                return item
-        return None
+        cell = next(iter(self._safe_unused), None)
+        if cell is None:
+            return None
+        return decode_cell(cell, self.width)
 
     def make_random_move(self):
         """
@@ -310,30 +445,27 @@ class MinesweeperAI():
             2) are not known to be mines
         """
 
-        board_cells_set = set(self.board_cells)
-        free_cells = list(board_cells_set - self.mines - self.moves_made)
-        free_cells_count = len(free_cells)
+        free_cells = self._board_mask & ~(self._mines_mask | self._moves_mask)
 
-        if free_cells_count == 0:
+        if not free_cells:
             return None
 
         if self.knowledge:
-            def get_cells(sentence: Sentence):
-                return sentence.cells
-
-            dangerous_cells = flat_map(get_cells, self.knowledge)
-            for free_cell in free_cells:
-                if free_cell not in self.moves_made and free_cell not in dangerous_cells:
-                    # Return first possible 0 mines cell.
-                    return free_cell
-
-            # Return first cell with less possible mines.
-            sorted_knowledge = sorted(self.knowledge, key=attrgetter('count'))
-            safest_cells = sorted_knowledge[0].cells
-            index = random.randrange(len(safest_cells))
-            dangerous_cell = list(safest_cells)[index]
-            return dangerous_cell
+            dangerous_cells = 0
+            for sentence in self.knowledge:
+                dangerous_cells |= sentence.mask
+            unmentioned_cells = free_cells & ~dangerous_cells
+            if unmentioned_cells:
+                # Return a random cell no sentence mentions.
+                return self._random_cell(unmentioned_cells)
+
+            # Return a cell of the sentence with less possible mines.
+            safest_knowledge = min(self.knowledge, key=attrgetter('count'))
+            return self._random_cell(safest_knowledge.mask)
         else:
-            index = random.randrange(free_cells_count)
-            unknown_cell = free_cells[index]
-            return unknown_cell
+            return self._random_cell(free_cells)
+
+    def _random_cell(self, mask):
+        # Pick a random set bit of the mask, as an (i, j) tuple
+        index = self._rng.randrange(mask.bit_count())
+        return decode_cell(nth_cell(mask, index), self.width)